@@ -1,36 +1,22 @@
+import functools
 import os
 import sys
+import threading
+import time
 from datetime import datetime
+import numpy as np
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import SystemMessage, HumanMessage
-from itertools import chain
+from sentence_transformers import CrossEncoder
 from ingest_all import load_vector_store
+from vector_store import normalize, top_k
 
 # Load environment variables
 load_dotenv()
 
-class DocumentChatBot:
-    def __init__(self, vector_store_path: str = "vectordb/vector_store_all.pkl"):
-        """Initialize the chatbot with a pre-built vector store."""
-        try:
-            self.vector_store = load_vector_store(vector_store_path)
-            self.retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 10},
-            )
-            self.llm = init_chat_model("mistral-large-latest", model_provider="mistralai")
-            print("🤖 Subsurface Document Assistant ready!\n")
-        except FileNotFoundError:
-            print("❌ Vector store not found. Please run 'python ingest.py' first to process your document.")
-            sys.exit(1)
-        except Exception as e:
-            print(f"❌ Error initializing chatbot: {str(e)}")
-            sys.exit(1)
-    
-    def get_system_prompt(self):
-        """Enhanced system prompt for travel and event/conference document analysis."""
-        return """You are a highly qualified personal assistance with expertise in:
+# System prompt for travel and event/conference document analysis
+_SYSTEM_PROMPT = """You are a highly qualified personal assistance with expertise in:
 
 🔍 **travel planning:**
 
@@ -56,23 +42,142 @@ class DocumentChatBot:
 
 Use the provided context to answer questions accurately and professionally."""
 
+class QueryCache:
+    """
+    Semantic cache of previous answers, keyed on the question embedding.
+
+    A question whose embedding has cosine similarity >= threshold with a
+    cached one reuses that answer, skipping retrieval and the LLM call.
+    Entries expire after `ttl` seconds and the least recently used entry
+    is evicted once `max_size` is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 128, ttl: float = 300):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._embeddings = None  # L2-normalized, so cosine is a dot product
+        self._entries = []  # (context_docs, response, created_at), parallel to _embeddings
+        self._lock = threading.RLock()
+
+    def _remove(self, indices):
+        keep = np.setdiff1d(np.arange(len(self._entries)), indices)
+        self._embeddings = self._embeddings[keep]
+        self._entries = [self._entries[i] for i in keep]
+
+    def get(self, embedding):
+        """Return the cached (context_docs, response) for a similar question, or None."""
+        with self._lock:
+            if not self._entries:
+                return None
+
+            now = time.monotonic()
+            expired = [i for i, (_, _, created_at) in enumerate(self._entries) if now - created_at > self.ttl]
+            if expired:
+                self._remove(expired)
+                if not self._entries:
+                    return None
+
+            similarities = self._embeddings @ normalize(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            # Move the hit to the end so the front holds the least recently used entry
+            entry = self._entries[best]
+            row = self._embeddings[best]
+            self._remove([best])
+            self._embeddings = np.vstack([self._embeddings, row])
+            self._entries.append(entry)
+            return entry[0], entry[1]
+
+    def put(self, embedding, context_docs, response):
+        """Cache a response for the question with the given embedding."""
+        row = normalize(embedding)[None, :]
+        with self._lock:
+            if self._entries and len(self._entries) >= self.max_size:
+                self._remove([0])
+            if not self._entries:
+                self._embeddings = row
+            else:
+                self._embeddings = np.vstack([self._embeddings, row])
+            self._entries.append((context_docs, response, time.monotonic()))
+
+
+class DocumentChatBot:
+    def __init__(self, vector_store_path: str = "vectordb/vector_store_all"):
+        """Initialize the chatbot with a pre-built vector store."""
+        try:
+            self.vector_store = load_vector_store(vector_store_path)
+            # Over-retrieve cheaply, then keep only the best chunks for the prompt
+            self.retrieve_k = 20
+            self.rerank_top_n = 3
+            self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+            # Safeguard only: with rerank_top_n=3 and 1000-char chunks the context
+            # stays under ~3000 chars, so this binds only if those settings grow
+            self.max_context_chars = 6000
+            self._system_msg = SystemMessage(content=_SYSTEM_PROMPT)
+            self.cache = QueryCache()
+            self.embed_question = functools.lru_cache(maxsize=1024)(self._embed_question)
+            self.llm = init_chat_model("mistral-large-latest", model_provider="mistralai")
+            print("🤖 Subsurface Document Assistant ready!\n")
+        except FileNotFoundError:
+            print("❌ Vector store not found. Please run 'python ingest.py' first to process your document.")
+            sys.exit(1)
+        except Exception as e:
+            print(f"❌ Error initializing chatbot: {str(e)}")
+            sys.exit(1)
+    
+    def _embed_question(self, question: str):
+        """Embed a question; wrapped in an LRU cache so repeated questions skip the model."""
+        return tuple(self.vector_store.embedding.embed_query(question))
+
+    def rerank(self, question: str, docs):
+        """Keep the `rerank_top_n` chunks the cross-encoder scores as most relevant."""
+        if len(docs) <= self.rerank_top_n:
+            return docs
+        
+        scores = self.reranker.predict([(question, doc.page_content) for doc in docs])
+        ranked = top_k(np.asarray(scores), self.rerank_top_n)
+        return [docs[i] for i in ranked]
+
     def search_and_respond(self, question: str):
-        """Search the document and generate a response."""
+        """Search the document, print the response as it streams in and return it."""
         print("🔍 Searching document...")
         
+        # Embed the question once; reused for the cache lookup and retrieval
+        query_embedding = self.embed_question(question)
+        
+        cached = self.cache.get(query_embedding)
+        if cached is not None:
+            print("⚡ Found a similar question in cache\n")
+            print("🤖 **Answer:**")
+            print(cached[1])
+            return cached[1]
+        
         # Retrieve relevant chunks
-        context = self.retriever.batch([question])
-        context_docs = list(chain.from_iterable(context))
+        context_docs = self.vector_store.similarity_search_by_vector(query_embedding, k=self.retrieve_k)
         
         if not context_docs:
-            return "❌ No relevant information found in the document for your question."
+            response = "❌ No relevant information found in the document for your question."
+            print(response)
+            return response
         
-        # Prepare context text
-        context_text = "\n".join(doc.page_content for doc in context_docs)
+        context_docs = self.rerank(question, context_docs)
+        
+        # Prepare context text, keeping the highest-ranked chunks that fit the budget
+        pieces = []
+        used = 0
+        for doc in context_docs:
+            if pieces and used + len(doc.page_content) > self.max_context_chars:
+                break
+            pieces.append(doc.page_content)
+            used += len(doc.page_content) + 1
+        context_text = "\n".join(pieces)
         
         # Build messages for the LLM
         messages = [
-            SystemMessage(content=self.get_system_prompt()),
+            self._system_msg,
             HumanMessage(content=f"""**Document Context:**
 {context_text}
 
@@ -83,9 +188,18 @@ Please provide a comprehensive answer based on the document content above.""")
         
         # Generate response
         print("🧠 Analyzing and generating response...\n")
-        response = self.llm.invoke(messages)
+        print("🤖 **Answer:**")
+        
+        # Stream tokens as they arrive instead of waiting for the full answer
+        chunks = []
+        for chunk in self.llm.stream(messages):
+            print(chunk.content, end="", flush=True)
+            chunks.append(chunk.content)
+        print()
         
-        return response.content
+        response = "".join(chunks)
+        self.cache.put(query_embedding, context_docs, response)
+        return response
     
     def display_welcome(self):
         """Display welcome message and usage instructions."""
@@ -139,10 +253,8 @@ Welcome! I'm your specialized assistant in travel and conference planning.
                 #print(f"\n📝 Question: {question}")
                 print("-" * 60)
                 
-                response = self.search_and_respond(question)
+                self.search_and_respond(question)
                 
-                print(f"🤖 **Answer:**")
-                print(response)
                 print("\n" + "="*80 + "\n")
                 
             except KeyboardInterrupt:
@@ -1,24 +1,90 @@
 import os
 import pickle
 import glob
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader, PDFPlumberLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_core.vectorstores import InMemoryVectorStore
+from pdf_loader import load_pdf
+
+# torch, optimum, faiss and numba are imported inside the functions that use
+# them: spawned PDF loader workers re-run this module's top level when it is
+# the __main__ script, and they only need to parse PDFs.
 
 # Load environment variables
 load_dotenv()
 
-def ingest_multiple_pdfs(data_folder: str = "data", vector_store_path: str = "vectordb/vector_store_all.pkl"):
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+EMBED_BATCH_SIZE = 128
+ONNX_MODEL_DIR = "models/mpnet-onnx"
+
+# Embedder ids recorded in saved stores, so queries are embedded by the
+# same model as the documents
+ONNX_EMBEDDER = f"onnx-int8:{EMBEDDING_MODEL}"
+PYTORCH_EMBEDDER = f"pytorch:{EMBEDDING_MODEL}"
+
+def get_embeddings(embedder: str = None):
+    """
+    Create the embedding model used for both ingestion and queries.
+    
+    Without an embedder id, uses the int8 ONNX export when it exists. The
+    export runs on the CPU; the GPU is only used by the PyTorch fallback
+    when no export exists.
+    
+    Args:
+        embedder (str): ONNX_EMBEDDER or PYTORCH_EMBEDDER, as recorded in a
+            saved store, to rebuild the model its documents were embedded with
+    """
+    from onnx_embeddings import OnnxEmbeddings, QUANTIZED_MODEL_FILE
+    
+    if embedder not in (None, ONNX_EMBEDDER, PYTORCH_EMBEDDER):
+        raise ValueError(f"Unknown embedder: {embedder}")
+    
+    if embedder == ONNX_EMBEDDER or (
+        embedder is None and os.path.exists(os.path.join(ONNX_MODEL_DIR, QUANTIZED_MODEL_FILE))
+    ):
+        return OnnxEmbeddings(ONNX_MODEL_DIR, batch_size=EMBED_BATCH_SIZE)
+    
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+        encode_kwargs={"batch_size": EMBED_BATCH_SIZE, "normalize_embeddings": True},
+    )
+
+def embedder_id(embeddings):
+    """Id of the embedding model, as recorded in saved stores."""
+    from onnx_embeddings import OnnxEmbeddings
+    
+    return ONNX_EMBEDDER if isinstance(embeddings, OnnxEmbeddings) else PYTORCH_EMBEDDER
+
+def ensure_onnx_model():
+    """Export the embedding model to quantized ONNX once, before anything is embedded."""
+    from onnx_embeddings import QUANTIZED_MODEL_FILE, export_onnx_model
+    
+    if os.path.exists(os.path.join(ONNX_MODEL_DIR, QUANTIZED_MODEL_FILE)):
+        return
+    
+    print(f"📦 Exporting embedding model to ONNX (int8): {ONNX_MODEL_DIR}")
+    try:
+        export_onnx_model(EMBEDDING_MODEL, ONNX_MODEL_DIR)
+    except Exception as e:
+        print(f"   ⚠️  ONNX export failed, using the PyTorch model: {str(e)}")
+
+def ingest_multiple_pdfs(data_folder: str = "data", vector_store_path: str = "vectordb/vector_store_all"):
     """
     Ingest all PDF files in a folder and create a unified vector store.
     
     Args:
         data_folder (str): Path to the folder containing PDF files
-        vector_store_path (str): Path to save the vector store
+        vector_store_path (str): Base path to save the vector store files to
     """
+    from vector_store import MatrixVectorStore
     
     print(f"🔄 Starting batch ingestion from folder: {data_folder}")
     
@@ -39,81 +105,109 @@ def ingest_multiple_pdfs(data_folder: str = "data", vector_store_path: str = "ve
         print(f"   - {os.path.basename(pdf_file)}")
     print()
     
-    all_documents = []
     processed_files = []
+    total_pages = 0
+    loader_errors = []
     
-    # Process each PDF file
-    for i, pdf_path in enumerate(pdf_files, 1):
-        try:
-            filename = os.path.basename(pdf_path)
-            print(f"📖 Processing file {i}/{len(pdf_files)}: {filename}")
-            
-            # Load PDF document
-            loader = PDFPlumberLoader(pdf_path)
-            docs = loader.load()
-            
-            # Add source filename to metadata for each document
-            for doc in docs:
-                doc.metadata["source_file"] = filename
-            
-            all_documents.extend(docs)
-            processed_files.append(filename)
-            
-            print(f"   ✅ Loaded {len(docs)} pages from {filename}")
-            
-        except Exception as e:
-            print(f"   ❌ Error processing {filename}: {str(e)}")
-            continue
+    # Bounded so loading can't run arbitrarily far ahead of embedding
+    batches = queue.Queue(maxsize=8)
     
-    if not all_documents:
-        print("❌ No documents were successfully processed.")
-        return None
-    
-    total_pages = len(all_documents)
-    print(f"\n📊 Total pages loaded: {total_pages} from {len(processed_files)} files")
-    
-    # Split documents into chunks
-    print("🔪 Splitting documents into chunks...")
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000, 
         chunk_overlap=200, 
         add_start_index=True
     )
-    all_splits = text_splitter.split_documents(all_documents)
     
-    print(f"✅ Created {len(all_splits)} chunks from all documents")
+    def load_and_split():
+        """Producer: load PDFs in parallel, split them and queue batches of chunks."""
+        nonlocal total_pages
+        pending = []
+        try:
+            # pdfplumber parsing is CPU-bound, so files are loaded in worker processes.
+            # Spawn rather than fork: this thread runs while the main thread brings
+            # up torch, and forking a multi-threaded process can deadlock the child.
+            mp_context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(mp_context=mp_context) as executor:
+                futures = [executor.submit(load_pdf, pdf_path) for pdf_path in pdf_files]
+                
+                for i, (pdf_path, future) in enumerate(zip(pdf_files, futures), 1):
+                    filename = os.path.basename(pdf_path)
+                    try:
+                        docs = future.result()
+                        print(f"📖 Processed file {i}/{len(pdf_files)}: {filename}")
+                        
+                        total_pages += len(docs)
+                        processed_files.append(filename)
+                        
+                        print(f"   ✅ Loaded {len(docs)} pages from {filename}")
+                        
+                    except Exception as e:
+                        print(f"   ❌ Error processing {filename}: {str(e)}")
+                        continue
+                    
+                    pending.extend(text_splitter.split_documents(docs))
+                    while len(pending) >= EMBED_BATCH_SIZE:
+                        batches.put(pending[:EMBED_BATCH_SIZE])
+                        pending = pending[EMBED_BATCH_SIZE:]
+            
+            if pending:
+                batches.put(pending)
+        except Exception as e:
+            loader_errors.append(e)
+        finally:
+            batches.put(None)
+    
+    # Load and split in the background while the embedding model runs
+    loader = threading.Thread(target=load_and_split, daemon=True)
+    loader.start()
     
     # Initialize embeddings model
     print("🤖 Initializing embedding model...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2"
-    )
+    ensure_onnx_model()
+    embeddings = get_embeddings()
+    
+    # Compute embeddings batch by batch as chunks arrive
+    print("🗄️ Computing embeddings as documents are loaded and split...")
+    all_splits = []
+    vectors = []
+    while (batch := batches.get()) is not None:
+        vectors.extend(embeddings.embed_documents([doc.page_content for doc in batch]))
+        all_splits.extend(batch)
+    
+    loader.join()
+    if loader_errors:
+        raise loader_errors[0]
+    
+    if not all_splits:
+        print("❌ No documents were successfully processed.")
+        return None
     
-    # Create vector store and add documents
-    print("🗄️ Creating vector store and computing embeddings...")
-    vector_store = InMemoryVectorStore(embeddings)
-    ids = vector_store.add_documents(documents=all_splits)
+    print(f"\n📊 Total pages loaded: {total_pages} from {len(processed_files)} files")
+    print(f"✅ Created {len(all_splits)} chunks from all documents")
     
-    print(f"✅ Added {len(ids)} document chunks to vector store")
+    # Create vector store
+    vector_store = MatrixVectorStore.from_embeddings(all_splits, vectors, embeddings)
+    
+    print(f"✅ Added {len(vector_store)} document chunks to vector store")
     
     # Save vector store to disk
     print(f"💾 Saving vector store to: {vector_store_path}")
-    with open(vector_store_path, 'wb') as f:
-        pickle.dump(vector_store, f)
+    vector_store.save(vector_store_path, embedder_id(embeddings))
     
     print("\n🎉 Batch ingestion completed successfully!")
     print(f"📁 Processed files: {', '.join(processed_files)}")
     
     return vector_store
 
-def ingest_pdf(file_path: str, vector_store_path: str = "vectordb/vector_store.pkl"):
+def ingest_pdf(file_path: str, vector_store_path: str = "vectordb/vector_store"):
     """
     Ingest a PDF file and create a vector store with embeddings.
     
     Args:
         file_path (str): Path to the PDF file
-        vector_store_path (str): Path to save the vector store
+        vector_store_path (str): Base path to save the vector store files to
     """
+    from vector_store import MatrixVectorStore
     
     print(f"🔄 Starting ingestion of: {file_path}")
     
@@ -142,57 +236,74 @@ def ingest_pdf(file_path: str, vector_store_path: str = "vectordb/vector_store.p
     
     # Initialize embeddings model
     print("🤖 Initializing embedding model...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2"
-    )
+    ensure_onnx_model()
+    embeddings = get_embeddings()
     
-    # Create vector store and add documents
+    # Compute embeddings and create vector store
     print("🗄️ Creating vector store and computing embeddings...")
-    vector_store = InMemoryVectorStore(embeddings)
-    ids = vector_store.add_documents(documents=all_splits)
+    vectors = embeddings.embed_documents([doc.page_content for doc in all_splits])
+    vector_store = MatrixVectorStore.from_embeddings(all_splits, vectors, embeddings)
     
-    print(f"✅ Added {len(ids)} document chunks to vector store")
+    print(f"✅ Added {len(vector_store)} document chunks to vector store")
     
     # Save vector store to disk
     print(f"💾 Saving vector store to: {vector_store_path}")
-    with open(vector_store_path, 'wb') as f:
-        pickle.dump(vector_store, f)
+    vector_store.save(vector_store_path, embedder_id(embeddings))
     
     print("🎉 Ingestion completed successfully!")
     return vector_store
 
-def load_vector_store(vector_store_path: str = "vector_store.pkl"):
+def load_vector_store(vector_store_path: str = "vectordb/vector_store_all"):
     """
     Load a previously saved vector store.
     
     Args:
-        vector_store_path (str): Path to the saved vector store
+        vector_store_path (str): Base path of the saved vector store, or a legacy pickle
+            file (also looked up as `vector_store_path + ".pkl"`), which is converted
+            and saved under the base path on first load
         
     Returns:
-        InMemoryVectorStore: Loaded vector store
+        MatrixVectorStore: Loaded vector store
     """
-    if not os.path.exists(vector_store_path):
-        raise FileNotFoundError(f"Vector store not found: {vector_store_path}")
+    from vector_store import MatrixVectorStore
     
     print(f"📥 Loading vector store from: {vector_store_path}")
-    with open(vector_store_path, 'rb') as f:
-        vector_store = pickle.load(f)
+    base_path = vector_store_path.removesuffix(".pkl")
+    if MatrixVectorStore.exists(base_path):
+        vector_store = MatrixVectorStore.load(base_path, get_embeddings)
+    else:
+        # Legacy format: a whole pickled InMemoryVectorStore, either at the
+        # given path or at the old default "<base path>.pkl"
+        legacy_paths = [vector_store_path, base_path + ".pkl"]
+        legacy_path = next((path for path in legacy_paths if os.path.isfile(path)), None)
+        if legacy_path is None:
+            raise FileNotFoundError(f"Vector store not found: {vector_store_path}")
+        
+        print(f"   Converting legacy pickled vector store: {legacy_path}")
+        with open(legacy_path, 'rb') as f:
+            vector_store = MatrixVectorStore.from_store(pickle.load(f))
+        
+        # Save the converted store so later startups memory-map it instead
+        print(f"💾 Saving converted vector store to: {base_path}")
+        vector_store.save(base_path, embedder_id(vector_store.embedding))
     
     print("✅ Vector store loaded successfully!")
     return vector_store
 
 if __name__ == "__main__":
+    from vector_store import MatrixVectorStore
+    
     # Configuration
     DATA_FOLDER = "data"
     SINGLE_PDF_FILE = "data/4408_LOGS.pdf"
-    VECTOR_STORE_PATH = "vectordb/vector_store_all.pkl"
+    VECTOR_STORE_PATH = "vectordb/vector_store_all"
     
     try:
         # Create data directory if it doesn't exist
         os.makedirs(DATA_FOLDER, exist_ok=True)
         
         # Check if vector store already exists
-        if os.path.exists(VECTOR_STORE_PATH):
+        if MatrixVectorStore.exists(VECTOR_STORE_PATH):
             response = input(f"Vector store '{VECTOR_STORE_PATH}' already exists. Overwrite? (y/n): ")
             if response.lower() != 'y':
                 print("❌ Ingestion cancelled.")
@@ -0,0 +1,76 @@
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+def export_onnx_model(model_name: str, output_dir: str):
+    """
+    Export a sentence-transformers model to ONNX with dynamic int8 quantization.
+
+    Args:
+        model_name (str): HuggingFace model id to export
+        output_dir (str): Folder to write the quantized model and tokenizer to
+    """
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=quantization_config)
+    tokenizer.save_pretrained(output_dir)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings computed by an int8-quantized ONNX Runtime export of a
+    sentence-transformers model (mean pooling + L2 normalization, like
+    all-mpnet-base-v2).
+
+    Runs on the CPU: the dynamically quantized int8 operators target
+    CPU execution, not ONNX Runtime's CUDA provider.
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = 32, max_length: int = 384):
+        if not os.path.exists(os.path.join(model_dir, QUANTIZED_MODEL_FILE)):
+            raise FileNotFoundError(f"ONNX model not found in: {model_dir}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=QUANTIZED_MODEL_FILE)
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def _embed(self, texts):
+        # Batch texts of similar length together so each batch pads to a
+        # short maximum, then put the vectors back in input order
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        vectors = [None] * len(texts)
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = np.asarray(self.model(**inputs).last_hidden_state)
+
+            # Mean pooling over real (non-padding) tokens
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            for i, vector in zip(batch, (pooled / np.clip(norms, 1e-12, None)).tolist()):
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts))
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
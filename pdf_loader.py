@@ -0,0 +1,16 @@
+import os
+from langchain_community.document_loaders import PDFPlumberLoader
+
+def load_pdf(pdf_path: str):
+    """
+    Load the pages of a single PDF, tagging each with its source filename.
+    
+    Runs in spawned worker processes during batch ingestion. Workers import
+    this module and re-run the top level of the __main__ script, so both this
+    module and ingest_all.py keep torch, optimum, faiss and numba out of
+    their module-level imports.
+    """
+    docs = PDFPlumberLoader(pdf_path).load()
+    for doc in docs:
+        doc.metadata["source_file"] = os.path.basename(pdf_path)
+    return docs
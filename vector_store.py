@@ -0,0 +1,347 @@
+import json
+import os
+import uuid
+import faiss
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+    from numba import njit, prange
+
+    @njit("i4[::1](i1[:, ::1], i1[::1])", parallel=True, fastmath=True, cache=True)
+    def _numba_batch_dot(matrix, query):
+        out = np.empty(matrix.shape[0], np.int32)
+        for i in prange(matrix.shape[0]):
+            s = np.int32(0)
+            for k in range(matrix.shape[1]):
+                s += np.int32(matrix[i, k]) * np.int32(query[k])
+            out[i] = s
+        return out
+
+
+EMBEDDER_METADATA_KEY = b"embedder"
+
+
+def quantize(vectors):
+    """
+    Quantize float vectors to int8 with a per-vector scale.
+
+    Args:
+        vectors: Array-like of shape (dim,) or (N, dim)
+
+    Returns:
+        tuple: (int8 vectors, float32 scales) where vector ≈ int8 / scale
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    max_abs = np.max(np.abs(vectors), axis=-1, keepdims=True)
+    scales = np.divide(127.0, max_abs, out=np.zeros_like(max_abs), where=max_abs > 0)
+    quantized = np.rint(vectors * scales).astype(np.int8)
+    return quantized, scales.squeeze(-1)
+
+
+def batch_dot(matrix, query):
+    """
+    Dot product of an int8 query against every row of an int8 matrix.
+
+    Uses SimSIMD when installed, otherwise a parallel Numba kernel.
+
+    Args:
+        matrix (np.ndarray): C-contiguous int8 array of shape (N, dim)
+        query (np.ndarray): int8 array of shape (dim,)
+
+    Returns:
+        np.ndarray: Array of N dot products
+    """
+    if simsimd is not None:
+        return np.asarray(simsimd.cdist(query[None, :], matrix, metric="dot"))[0]
+    return _numba_batch_dot(matrix, np.ascontiguousarray(query))
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first.
+
+    Partitions in O(N) and only sorts the k selected scores, instead of
+    sorting all N.
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        indices = np.argpartition(scores, -k)[-k:]
+    else:
+        indices = np.arange(len(scores))
+    return indices[np.argsort(scores[indices])[::-1]]
+
+
+def normalize(vectors):
+    """L2-normalize float vectors along the last axis, leaving zero vectors as-is."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def build_hnsw_index(vectors, m: int = 32, ef_search: int = 64):
+    """
+    Build a FAISS HNSW index for approximate cosine search.
+
+    Args:
+        vectors: L2-normalized array of shape (N, dim)
+        m (int): Number of graph neighbours per node
+        ef_search (int): Size of the candidate list explored per query
+
+    Returns:
+        faiss.IndexHNSWFlat: Inner-product (i.e. cosine) index over the vectors
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.IndexHNSWFlat(vectors.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efSearch = ef_search
+    index.add(vectors)
+    return index
+
+
+def documents_to_table(documents, scales):
+    """
+    Convert chunks to a columnar Arrow table.
+
+    `source_file` and `start_index` get their own columns; any other
+    metadata is kept as a JSON string.
+
+    Args:
+        documents (list[Document]): Chunks to convert
+        scales: Per-chunk int8 quantization scales
+
+    Returns:
+        pa.Table: Table with id, text, source_file, start_index, metadata and scale columns
+    """
+    extra_metadata = [
+        {key: value for key, value in doc.metadata.items() if key not in ("source_file", "start_index")}
+        for doc in documents
+    ]
+    return pa.table({
+        "id": pa.array([doc.id or str(uuid.uuid4()) for doc in documents], pa.string()),
+        "text": pa.array([doc.page_content for doc in documents], pa.string()),
+        "source_file": pa.array([doc.metadata.get("source_file") for doc in documents], pa.string()),
+        "start_index": pa.array([doc.metadata.get("start_index") for doc in documents], pa.int64()),
+        "metadata": pa.array([json.dumps(metadata, default=str) for metadata in extra_metadata], pa.string()),
+        "scale": pa.array(np.asarray(scales, dtype=np.float32), pa.float32()),
+    })
+
+
+class MatrixVectorStore(VectorStore):
+    """
+    Read-only vector store backed by a quantized embedding matrix.
+
+    The vectors are L2-normalized and stacked once into a contiguous int8
+    matrix (with per-vector float32 scales), so each query is a single
+    int8 dot-product kernel call instead of a NumPy cosine computation
+    over per-document Python lists.
+
+    Chunks are held column-wise in an Arrow table and only the top-k rows
+    are materialized as Documents per query. On disk the table is a
+    zstd-compressed `.parquet` file and the matrix a raw `.vec.npy` file
+    that is memory-mapped on load, so startup doesn't unpickle N x dim
+    floats or N Document objects.
+
+    Stores with at least `hnsw_min_docs` chunks also get a FAISS HNSW
+    index, and queries go through it instead of the exact linear scan.
+    The index is saved to a `.hnsw` file and read fully into memory on load.
+    """
+
+    hnsw_min_docs = 10_000
+
+    def __init__(self, embedding, table, matrix, index=None):
+        self.embedding = embedding
+        self._table = table
+        self._matrix = matrix
+        self._scales = table.column("scale").to_numpy()
+
+        # Precomputed once so scoring is a multiply with no NaN/inf cleanup;
+        # all-zero vectors have scale 0 and are ranked last instead
+        self._inv_scales = np.divide(
+            1.0, self._scales, out=np.zeros_like(self._scales), where=self._scales > 0
+        )
+        self._zero_rows = np.flatnonzero(self._scales == 0)
+        self._index = index
+
+    @classmethod
+    def from_embeddings(cls, documents, vectors, embedding):
+        """
+        Build a store from documents and their precomputed embeddings.
+
+        Args:
+            documents (list[Document]): Chunks to store
+            vectors: Embeddings of the chunks, shape (N, dim)
+            embedding (Embeddings): Model used to embed queries
+
+        Returns:
+            MatrixVectorStore: Store with its int8 matrix (and HNSW index) built
+        """
+        vectors = normalize(vectors)
+        matrix, scales = quantize(vectors)
+        index = build_hnsw_index(vectors) if len(documents) >= cls.hnsw_min_docs else None
+        return cls(embedding, documents_to_table(documents, scales), matrix, index)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [None] * len(texts)
+        documents = [
+            Document(id=doc_id, page_content=text, metadata=metadata)
+            for text, metadata, doc_id in zip(texts, metadatas, ids)
+        ]
+        return cls.from_embeddings(documents, embedding.embed_documents(list(texts)), embedding)
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Convert a legacy pickled InMemoryVectorStore.
+
+        Args:
+            store (InMemoryVectorStore): Store to take documents, vectors and embedding from
+
+        Returns:
+            MatrixVectorStore: Store with the same documents and vectors
+        """
+        records = list(store.store.values())
+        documents = [
+            Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+            for record in records
+        ]
+        return cls.from_embeddings(documents, [record["vector"] for record in records], store.embedding)
+
+    @staticmethod
+    def exists(path: str):
+        """Whether a store saved with `save` exists at `path`."""
+        return os.path.exists(path + ".parquet") and os.path.exists(path + ".vec.npy")
+
+    def save(self, path: str, embedder: str = None):
+        """
+        Save the store under the base path `path`.
+
+        Writes the chunk table to `path + ".parquet"`, the int8 matrix to
+        `path + ".vec.npy"` and, if built, the HNSW index to `path + ".hnsw"`.
+
+        Args:
+            path (str): Base path of the store files
+            embedder (str): Id of the model that embedded the documents, kept in
+                the Parquet schema metadata so `load` can embed queries the same way
+        """
+        table = self._table
+        if embedder is not None:
+            metadata = dict(table.schema.metadata or {})
+            metadata[EMBEDDER_METADATA_KEY] = embedder.encode()
+            table = table.replace_schema_metadata(metadata)
+        pq.write_table(table, path + ".parquet", compression="zstd")
+        np.save(path + ".vec.npy", self._matrix)
+
+        if self._index is not None:
+            faiss.write_index(self._index, path + ".hnsw")
+        elif os.path.exists(path + ".hnsw"):
+            os.remove(path + ".hnsw")
+
+    @classmethod
+    def load(cls, path: str, embedding_factory):
+        """
+        Load a store saved with `save`.
+
+        The embedding matrix is memory-mapped; the HNSW index, if any, is
+        read fully into memory.
+
+        Args:
+            path (str): Base path of the store files
+            embedding_factory (callable): Called with the embedder id recorded by
+                `save` (None if none was recorded); returns the Embeddings used to
+                embed queries
+
+        Returns:
+            MatrixVectorStore: Loaded store
+        """
+        table = pq.read_table(path + ".parquet", memory_map=True)
+        embedder = (table.schema.metadata or {}).get(EMBEDDER_METADATA_KEY)
+        embedding = embedding_factory(embedder.decode() if embedder is not None else None)
+
+        # Copy-on-write keeps the map lazy while giving kernels a writable array
+        matrix = np.load(path + ".vec.npy", mmap_mode="c")
+
+        index = None
+        if os.path.exists(path + ".hnsw"):
+            index = faiss.read_index(path + ".hnsw")
+
+        return cls(embedding, table, matrix, index)
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def _documents(self, indices):
+        """Materialize the rows at `indices` as Documents, in that order."""
+        rows = self._table.take(pa.array(indices, pa.int64())).to_pylist()
+        documents = []
+        for row in rows:
+            metadata = json.loads(row["metadata"])
+            if row["source_file"] is not None:
+                metadata["source_file"] = row["source_file"]
+            if row["start_index"] is not None:
+                metadata["start_index"] = row["start_index"]
+            documents.append(Document(id=row["id"], page_content=row["text"], metadata=metadata))
+        return documents
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def _search(self, embedding, k):
+        """Return the indices and scores of the top-k documents for a query vector."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        query = normalize(embedding)
+        if self._index is not None:
+            return self._search_hnsw(query, k)
+        return self._search_exact(query, k)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        if not len(self):
+            return []
+        top_k_idx, top_k_scores = self._search(embedding, k)
+        return list(zip(self._documents(top_k_idx), top_k_scores.tolist()))
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        if not len(self):
+            return []
+        top_k_idx, _ = self._search(embedding, k)
+        return self._documents(top_k_idx)
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def _search_exact(self, query, k):
+        # Rows and query are unit vectors, so cosine is the dot product
+        # with the quantization scales divided back out
+        query, query_scale = quantize(query)
+        scores = batch_dot(self._matrix, query) * self._inv_scales
+        scores *= 1.0 / query_scale if query_scale > 0 else 0.0
+        scores[self._zero_rows] = -1
+
+        top_k_idx = top_k(scores, k)
+        return top_k_idx, scores[top_k_idx]
+
+    def _search_hnsw(self, query, k):
+        self._index.hnsw.efSearch = max(self._index.hnsw.efSearch, k)
+        scores, indices = self._index.search(query[None, :], k)
+
+        # FAISS pads with -1 when fewer than k neighbours are reachable
+        found = indices[0] >= 0
+        return indices[0][found], scores[0][found]